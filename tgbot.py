@@ -10,16 +10,23 @@
 # 5. 优化配置结构，使其更易于维护和扩展
 
 import asyncio
+import functools
 import hashlib
+import heapq
 import json
 import logging
 import os
 import shutil
 import platform
+import re
+import time
+from collections import Counter, namedtuple
+from dataclasses import dataclass, field, fields
 from datetime import datetime, timedelta
+from typing import Union
 
-import aiofiles
-import httpx
+import aiohttp
+import orjson
 import psutil
 import pytz
 from redis.asyncio import StrictRedis
@@ -27,7 +34,83 @@ from telegram import Update
 from telegram.ext import (Application, ApplicationBuilder, CommandHandler,
                           ContextTypes, MessageHandler, filters)
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # ================ 配置信息 ================
+def clean_pin_set(pins):
+    """清理pin列表中的 pt_pin= 前缀和分号，返回用于快速查找的集合"""
+    return frozenset(pin.replace("pt_pin=", "").strip(';') for pin in pins if pin)
+
+def compile_preserved_rules(preserved_config):
+    """预处理PRESERVED_PT_PINS配置，得到 {面板名: (pin集合, 模式)}"""
+    rules = {
+        name: (clean_pin_set(panel_config.get('pins', [])), panel_config.get('mode', 'exclude'))
+        for name, panel_config in preserved_config.items()
+    }
+    rules.setdefault('default', (frozenset(), 'exclude'))
+    return rules
+
+@dataclass(frozen=True)
+class Config:
+    """运行配置，字段与tgbot.json中的配置项一一对应，默认值仅在配置缺失时使用"""
+    # Telegram Bot 配置
+    TELEGRAM_TOKEN: str = ''
+    TG_USER_IDS: list = field(default_factory=list)
+    TELEGRAM_PROXY_API: str = ''
+    
+    # 主青龙面板配置
+    QL_URL: str = ''
+    CLIENT_ID: str = ''
+    CLIENT_SECRET: str = ''
+    
+    # 新增的青龙面板配置列表
+    QL_PANELS: list = field(default_factory=list)
+    
+    # 需要保留的pt_pin配置
+    PRESERVED_PT_PINS: dict = field(default_factory=lambda: {
+        'default': {
+            'pins': [],
+            'mode': 'exclude'
+        }
+    })
+    
+    # Redis 数据库配置
+    REDIS_HOST: str = 'localhost'
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    REDIS_PASSWORD: str = ''
+    
+    # 代理白名单 API 配置
+    PROXY_AUTH_KEY: str = ''
+    PROXY_API_URL: str = ''
+    
+    # 文件和存储配置
+    CK_FILE_PATH: Union[dict, str] = field(default_factory=lambda: {
+        'default': {
+            'path': "scripts/beta/env/ck.txt",
+            'pins': [],
+            'mode': 'exclude'
+        }
+    })
+    CURRENT_IP_KEY: str = "current_ip"
+    CURRENT_CK_HASH_KEY: str = "current_ck_hash"
+    LAST_SYNCED_CK_HASH_KEY: str = "last_synced_ck_hash"
+    LOG_DIR: str = "logs/scripts"
+    
+    # 定时任务配置
+    CK_UPDATE_INTERVAL: int = 20  # 分钟
+    IP_UPDATE_INTERVAL: int = 5   # 分钟
+    CK_SYNC_INTERVAL: int = 30    # 分钟
+    
+    # 预处理后的CK同步规则，避免每次判断时重复清理pin列表
+    PRESERVED_RULES: dict = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'PRESERVED_RULES', compile_preserved_rules(self.PRESERVED_PT_PINS))
+
 # 从JSON文件加载配置
 def load_config():
     config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tgbot.json')
@@ -35,65 +118,18 @@ def load_config():
         with open(config_path, 'r', encoding='utf-8') as f:
             config_data = json.load(f)
         
-        # 提取配置值（新格式包含value和description字段）
-        config = {}
-        for key, item in config_data['config'].items():
-            config[key] = item['value']
-            
+        # 提取配置值（新格式包含value和description字段），忽略未知的配置项
+        known_keys = {f.name for f in fields(Config) if f.init}
+        config = Config(**{
+            key: item['value'] for key, item in config_data['config'].items() if key in known_keys
+        })
+        
         print(f"✅ 已从 {config_path} 加载配置")
         return config
     except Exception as e:
         print(f"❌ 加载配置文件失败: {e}，将使用默认配置")
         # 默认配置，仅在无法加载配置文件时使用
-        return {
-            # Telegram Bot 配置
-            'TELEGRAM_TOKEN': '',
-            'TG_USER_IDS': [],
-            'TELEGRAM_PROXY_API': '',
-            
-            # 主青龙面板配置
-            'QL_URL': "",
-            'CLIENT_ID': '',
-            'CLIENT_SECRET': '',
-            
-            # 新增的青龙面板配置列表
-            'QL_PANELS': [],
-            
-            # 需要保留的pt_pin配置
-            'PRESERVED_PT_PINS': {
-                'default': {
-                    'pins': [],
-                    'mode': 'exclude'
-                }
-            },
-            
-            # Redis 数据库配置
-            'REDIS_HOST': 'localhost', 
-            'REDIS_PORT': 6379,
-            'REDIS_DB': 0, 
-            'REDIS_PASSWORD': '',
-            
-            # 代理白名单 API 配置
-            'PROXY_AUTH_KEY': "",
-            'PROXY_API_URL': "",
-            
-            # 文件和存储配置
-            'CK_FILE_PATH': {
-                'default': {
-                    'path': "scripts/beta/env/ck.txt",
-                    'pins': [],
-                    'mode': 'exclude'
-                }
-            },
-            'CURRENT_IP_KEY': "current_ip",
-            'CURRENT_CK_HASH_KEY': "current_ck_hash",
-            'LOG_DIR': "logs/scripts",
-            
-            # 定时任务配置
-            'CK_UPDATE_INTERVAL': 20,  # 分钟
-            'IP_UPDATE_INTERVAL': 5,   # 分钟
-            'CK_SYNC_INTERVAL': 30,    # 分钟
-        }
+        return Config()
 
 # 加载配置
 CONFIG = load_config()
@@ -101,6 +137,17 @@ CONFIG = load_config()
 # 时区设置
 LOCAL_TIMEZONE = pytz.timezone('Asia/Shanghai')
 
+# 青龙面板环境变量缓存时间（秒）
+ENVS_CACHE_TTL = 15
+# 删除Cookie时每个请求包含的最大ID数量
+DELETE_BATCH_SIZE = 50
+# 青龙令牌距过期不足该秒数时提前刷新
+TOKEN_REFRESH_MARGIN = 300
+
+# Cookie解析正则
+PT_KEY_RE = re.compile(r'pt_key=[^;\s]+')
+PT_PIN_RE = re.compile(r'pt_pin=([^;\s]+)')
+
 # ================ 日志设置 ================
 class ColoredFormatter(logging.Formatter):
     COLORS = {
@@ -108,20 +155,33 @@ class ColoredFormatter(logging.Formatter):
         'ERROR': '\033[91m', 'CRITICAL': '\033[1;91m', 'RESET': '\033[0m'
     }
     
+    def __init__(self):
+        super().__init__()
+        # 每个日志级别预先创建一个格式化器，避免每条日志都重新构造
+        self._formatters = {
+            level: self._make_formatter(f"{color}[%(asctime)s] {level[0]} | %(message)s{self.COLORS['RESET']}")
+            for level, color in self.COLORS.items() if level != 'RESET'
+        }
+        self._default_formatter = self._make_formatter(
+            f"{self.COLORS['RESET']}[%(asctime)s] %(levelname).1s | %(message)s{self.COLORS['RESET']}"
+        )
+    
+    def _make_formatter(self, log_format):
+        formatter = logging.Formatter(log_format)
+        formatter.formatTime = self.formatTime
+        return formatter
+    
     def formatTime(self, record, datefmt=None):
         return datetime.fromtimestamp(record.created, LOCAL_TIMEZONE).strftime(datefmt or '%m-%d %H:%M:%S')
     
     def format(self, record):
-        log_color = self.COLORS.get(record.levelname, self.COLORS['RESET'])
-        log_format = f"{log_color}[%(asctime)s] {record.levelname[0]} | %(message)s{self.COLORS['RESET']}"
-        formatter = logging.Formatter(log_format)
-        formatter.formatTime = self.formatTime
-        return formatter.format(record)
+        return self._formatters.get(record.levelname, self._default_formatter).format(record)
 
 # 初始化日志
 logger = logging.getLogger(__name__)
 
-# Redis客户端将在main函数中初始化
+# Redis客户端和HTTP客户端将在main函数中初始化
+http_session = None
 
 # ================ 工具函数 ================
 async def setup_logging():
@@ -136,28 +196,56 @@ async def setup_logging():
         log.addHandler(console)
         log.propagate = False
 
+def build_form_data(data, files):
+    """将data和files参数转换为aiohttp的multipart表单
+    
+    files 的值为 (文件名, bytes内容)。aiohttp发送后会关闭文件对象，
+    因此只接受已读入内存的内容，每次重试都能用同一份内容重新构造表单。
+    """
+    form = aiohttp.FormData()
+    for key, value in (data or {}).items():
+        form.add_field(key, str(value))
+    for key, (filename, content) in files.items():
+        form.add_field(key, content, filename=filename)
+    return form
+
 async def safe_request(method, url, **kwargs):
     """安全的HTTP请求包装器，支持重试和错误处理"""
     timeout = kwargs.pop('timeout', 10.0)
     retries = kwargs.pop('retries', 2)
     error_detail = kwargs.pop('error_detail', '')
+    parser = kwargs.pop('parser', None)
+    
+    files = kwargs.pop('files', None)
+    form_fields = kwargs.pop('data', None) if files else None
     
     for attempt in range(retries):
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await getattr(client, method)(url, **kwargs)
+            if files:
+                # 表单只能发送一次，每次重试都需要重新构造
+                kwargs['data'] = build_form_data(form_fields, files)
+            async with http_session.request(
+                method.upper(), url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+            ) as response:
                 response.raise_for_status()
-                return response.json() if 'json' in response.headers.get('content-type', '') else response.text
-        except httpx.HTTPStatusError as e:
-            error_msg = f"HTTP错误 {e.response.status_code}: {url}"
+                if parser:
+                    return await parser(response)
+                if 'json' in response.headers.get('content-type', ''):
+                    return orjson.loads(await response.read())
+                return await response.text()
+        except aiohttp.ClientResponseError as e:
+            if e.status == 401:
+                # 认证失败重试无意义，直接交给调用方处理（如青龙面板重新获取令牌）
+                raise
+            error_msg = f"HTTP错误 {e.status}: {url}"
             if attempt < retries - 1:
                 logger.warning(f"⚠️ {error_msg}，正在重试 ({attempt+1}/{retries})")
                 await asyncio.sleep(1)
             else:
                 logger.error(f"❌ {error_msg} {error_detail}")
                 raise
-        except httpx.RequestError as e:
-            error_msg = f"请求错误: {e} {url}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error_msg = f"请求错误: {e!r} {url}"
             if attempt < retries - 1:
                 logger.warning(f"⚠️ {error_msg}，正在重试 ({attempt+1}/{retries})")
                 await asyncio.sleep(1)
@@ -175,87 +263,192 @@ async def safe_request(method, url, **kwargs):
     
     return None
 
+def read_file_bytes(path):
+    """读取文件的全部内容（同步实现，通过asyncio.to_thread调用）"""
+    with open(path, 'rb') as f:
+        return f.read()
+
 async def notify(title, message, document=None):
-    """发送通知给管理员"""
-    base_url = CONFIG['TELEGRAM_PROXY_API'].rstrip('/')
+    """发送通知给管理员，所有管理员并行发送，至少一人发送成功即返回True"""
+    base_url = CONFIG.TELEGRAM_PROXY_API.rstrip('/')
     
-    for user_id in CONFIG['TG_USER_IDS']:
+    if document:
+        # 在线程中读取一次文件内容，所有管理员及每次重试共用
+        try:
+            files = {'document': (os.path.basename(document), await asyncio.to_thread(read_file_bytes, document))}
+        except OSError as e:
+            logger.error(f"❌ 读取通知文件 {document} 失败: {e}")
+            return False
+    
+    async def send_one(user_id):
         try:
             if document:
-                with open(document, 'rb') as f:
-                    files = {'document': f}
-                    data = {'chat_id': user_id, 'caption': f"{title}\n\n{message}"}
-                    await safe_request('post', f"{base_url}/bot{CONFIG['TELEGRAM_TOKEN']}/sendDocument", data=data, files=files)
+                data = {'chat_id': user_id, 'caption': f"{title}\n\n{message}"}
+                await safe_request('post', f"{base_url}/bot{CONFIG.TELEGRAM_TOKEN}/sendDocument", data=data, files=files)
             else:
                 params = {'chat_id': user_id, 'text': f"*{title}*\n\n{message}", 'parse_mode': 'Markdown'}
-                await safe_request('get', f"{base_url}/bot{CONFIG['TELEGRAM_TOKEN']}/sendMessage", params=params)
+                await safe_request('get', f"{base_url}/bot{CONFIG.TELEGRAM_TOKEN}/sendMessage", params=params)
             return True
         except Exception as e:
             logger.error(f"❌ 发送通知给 {user_id} 失败: {e}")
-    return False
+            return False
+    
+    results = await asyncio.gather(*(send_one(user_id) for user_id in CONFIG.TG_USER_IDS))
+    return any(results)
 
 # ================ 青龙面板操作 ================
+async def parse_cookie_envs(response):
+    """流式解析 /open/envs 响应，只保留JD_COOKIE环境变量，避免整个响应体驻留内存"""
+    return [
+        item async for item in ijson.items_async(response.content, 'data.item', use_float=True)
+        if item.get('name') == 'JD_COOKIE'
+    ]
+
 class QingLongAPI:
     """青龙面板API操作封装类"""
     
+    JSON_HEADERS = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    
     def __init__(self, url, client_id, client_secret, name="主面板"):
         self.url = url.rstrip('/')
         self.client_id = client_id
         self.client_secret = client_secret
         self.name = name
         self.token = None
+        # 令牌过期时间（Unix时间戳），面板未返回时为0表示不主动过期
+        self._token_expiration = 0
+        # 预先构造常用的URL、参数和错误描述，避免每次请求重复拼接
+        self._token_url = f"{self.url}/open/auth/token"
+        self._envs_url = f"{self.url}/open/envs"
+        self._envs_params = {'searchValue': 'JD_COOKIE'}
+        self._token_params = {'client_id': client_id, 'client_secret': client_secret}
+        self._error_detail = f"面板: {name}"
+        self._auth_header = None
+        # 环境变量短期缓存，相近的任务可共用同一次 /open/envs 请求
+        self._envs_cache = None
+        self._envs_ts = 0.0
+        # 正在进行中的 /open/envs 请求，供并发调用共用
+        self._envs_task = None
+        # 每次清除缓存时递增，用于丢弃清除前发出的请求结果
+        self._envs_version = 0
     
     async def get_token(self):
-        """获取青龙面板的访问令牌"""
-        if self.token:
+        """获取青龙面板的访问令牌，令牌在内存中缓存，临近过期时重新获取"""
+        if self.token and (not self._token_expiration or time.time() < self._token_expiration - TOKEN_REFRESH_MARGIN):
             return self.token
             
         try:
             result = await safe_request(
                 'get', 
-                f"{self.url}/open/auth/token", 
-                params={'client_id': self.client_id, 'client_secret': self.client_secret},
-                error_detail=f"面板: {self.name}"
+                self._token_url, 
+                params=self._token_params,
+                error_detail=self._error_detail
             )
-            self.token = result.get('data', {}).get('token')
+            data = result.get('data', {})
+            self.token = data.get('token')
+            self._token_expiration = data.get('expiration') or 0
+            self._auth_header = {'Authorization': f'Bearer {self.token}'} if self.token else None
             return self.token
         except Exception as e:
             logger.error(f"❌ 获取令牌失败 ({self.name}): {e}")
             return None
     
-    async def _request(self, method, endpoint, **kwargs):
+    async def _request(self, method, url, _retried=False, **kwargs):
         """发送API请求的通用方法"""
         token = await self.get_token()
         if not token:
             raise ValueError(f"无法获取{self.name}的访问令牌")
             
-        headers = kwargs.pop('headers', {})
-        headers['Authorization'] = f'Bearer {token}'
+        headers = kwargs.pop('headers', None)
+        request_headers = {**headers, **self._auth_header} if headers else self._auth_header
         
-        return await safe_request(
-            method, 
-            f"{self.url}{endpoint}", 
-            headers=headers, 
-            error_detail=f"面板: {self.name}",
-            **kwargs
-        )
+        try:
+            return await safe_request(
+                method, 
+                url, 
+                headers=request_headers, 
+                error_detail=self._error_detail,
+                **kwargs
+            )
+        except aiohttp.ClientResponseError as e:
+            if e.status != 401 or _retried:
+                raise
+            # 令牌失效，清除缓存后重新获取令牌并重试一次
+            logger.warning(f"⚠️ {self.name} 令牌已失效，重新获取")
+            self.token = None
+            self._auth_header = None
+            return await self._request(method, url, headers=headers, _retried=True, **kwargs)
+    
+    async def _fetch_envs(self):
+        """获取面板的全部JD_COOKIE，缓存有效期内的重复调用直接返回缓存
+        
+        缓存失效时并发的调用共用同一次请求，避免同时发出多个 /open/envs 请求。
+        """
+        if self._envs_cache is not None and time.monotonic() - self._envs_ts < ENVS_CACHE_TTL:
+            return self._envs_cache
+        
+        if self._envs_task is None:
+            self._envs_task = asyncio.create_task(self._load_envs())
+        # shield 避免某个调用方被取消时连带取消其他调用方共用的请求
+        return await asyncio.shield(self._envs_task)
+    
+    async def _load_envs(self):
+        """请求并解析面板的JD_COOKIE，结果写入缓存
+        
+        每个环境变量只解析一次 pt_key/pt_pin，缺少任一项的条目直接丢弃，
+        各个get_*cookies*方法只需从缓存中投影所需字段。
+        """
+        version = self._envs_version
+        try:
+            envs = await self._request_envs()
+            # 请求期间发生过变更时，结果可能是变更前的数据，不写入缓存
+            if version == self._envs_version:
+                self._envs_cache = envs
+                self._envs_ts = time.monotonic()
+            return envs
+        finally:
+            if self._envs_task is asyncio.current_task():
+                self._envs_task = None
+    
+    async def _request_envs(self):
+        """请求 /open/envs 并解析出包含 pt_key 和 pt_pin 的JD_COOKIE"""
+        # 只需要JD_COOKIE，由面板先按名称筛选；安装了ijson时边接收边解析，只保留JD_COOKIE条目
+        if ijson:
+            items = await self._request(
+                'get', self._envs_url, params=self._envs_params, parser=parse_cookie_envs
+            )
+        else:
+            result = await self._request('get', self._envs_url, params=self._envs_params)
+            items = [item for item in result.get("data", []) if item.get('name') == 'JD_COOKIE']
+        
+        envs = []
+        for item in items:
+            value = item.get('value', '')
+            pt_key = PT_KEY_RE.search(value)
+            pt_pin = PT_PIN_RE.search(value)
+            if pt_key and pt_pin:
+                pt_key, pt_pin = pt_key.group(0), pt_pin.group(0)
+                envs.append({
+                    'id': item.get('_id') or item.get('id'),
+                    'value': value,
+                    'cookie': pt_key + ';' + pt_pin + ';',
+                    'pt_key': pt_key,
+                    'pt_pin': pt_pin,
+                    'remarks': item.get('remarks', ''),
+                    'status': item.get('status', 1)  # 0为启用，1为禁用
+                })
+        return envs
+    
+    def invalidate_envs(self):
+        """面板环境变量发生变更后清除缓存，之后的调用不再共用变更前发出的请求"""
+        self._envs_cache = None
+        self._envs_task = None
+        self._envs_version += 1
     
     async def get_enabled_cookies(self):
         """获取青龙面板中启用的 Cookies"""
         try:
-            result = await self._request('get', '/open/envs')
-            
-            cookies = []
-            for item in result.get("data", []):
-                if item.get('status') == 0 and item.get('name') == 'JD_COOKIE':
-                    value = item.get('value', '')
-                    parts = value.split(';')
-                    pt_key = next((part for part in parts if "pt_key=" in part), "")
-                    pt_pin = next((part for part in parts if "pt_pin=" in part), "")
-                    if pt_key and pt_pin:
-                        cookies.append(f"{pt_key.strip()};{pt_pin.strip()};")
-            
-            return cookies
+            return [env['cookie'] for env in await self._fetch_envs() if env['status'] == 0]
         except Exception as e:
             logger.error(f"❌ 获取环境变量失败 ({self.name}): {e}")
             return []
@@ -263,86 +456,74 @@ class QingLongAPI:
     async def get_enabled_cookies_with_remarks(self):
         """获取青龙面板中启用的 Cookies 及其备注"""
         try:
-            result = await self._request('get', '/open/envs')
-            
-            cookies_info = []
-            for item in result.get("data", []):
-                if item.get('status') == 0 and item.get('name') == 'JD_COOKIE':
-                    value = item.get('value', '')
-                    parts = value.split(';')
-                    pt_key = next((part for part in parts if "pt_key=" in part), "")
-                    pt_pin = next((part for part in parts if "pt_pin=" in part), "")
-                    if pt_key and pt_pin:
-                        cookies_info.append({
-                            'value': f"{pt_key.strip()};{pt_pin.strip()};",
-                            'remarks': item.get('remarks', '')
-                        })
-            
-            return cookies_info
+            return [
+                {'value': env['cookie'], 'remarks': env['remarks']}
+                for env in await self._fetch_envs() if env['status'] == 0
+            ]
         except Exception as e:
             logger.error(f"❌ 获取环境变量及备注失败 ({self.name}): {e}")
             return []
     
-    async def get_all_cookies(self):
-        """获取青龙面板中所有的 Cookies（包括禁用的）以及它们的ID和状态"""
+    async def get_all_cookies(self, raise_errors=False):
+        """获取青龙面板中所有的 Cookies（包括禁用的）以及它们的ID和状态
+        
+        Args:
+            raise_errors: 获取失败时是否抛出异常。默认记录日志并返回空列表，
+                同步等需要区分“面板为空”和“获取失败”的场景应设为True
+        """
         try:
-            result = await self._request('get', '/open/envs')
-            
-            cookies_info = []
-            for item in result.get("data", []):
-                if item.get('name') == 'JD_COOKIE':
-                    value = item.get('value', '')
-                    parts = value.split(';')
-                    pt_key = next((part for part in parts if "pt_key=" in part), "")
-                    pt_pin = next((part.strip() for part in parts if "pt_pin=" in part), "")
-                    
-                    if pt_key and pt_pin:
-                        cookies_info.append({
-                            'id': item.get('_id') or item.get('id'),
-                            'value': value,
-                            'pt_pin': pt_pin,
-                            'status': item.get('status', 1)  # 0为启用，1为禁用
-                        })
-            
-            return cookies_info
+            return [
+                {
+                    'id': env['id'],
+                    'value': env['value'],
+                    'pt_key': env['pt_key'],
+                    'pt_pin': env['pt_pin'],
+                    'status': env['status']
+                }
+                for env in await self._fetch_envs()
+            ]
         except Exception as e:
             logger.error(f"❌ 获取所有环境变量失败 ({self.name}): {e}")
+            if raise_errors:
+                raise
             return []
     
-    async def delete_cookies(self, cookie_ids):
-        """删除指定ID的Cookies"""
+    async def _delete_batch(self, cookie_ids):
+        """删除一批Cookies，返回 (是否成功, 错误信息)"""
         try:
-            if not cookie_ids:
-                return True, "没有需要删除的Cookie"
-            
-            # 构造请求头
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            }
-            
             # 使用DELETE方法发送请求
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.request(
-                    method="DELETE",
-                    url=f"{self.url}/open/envs",
-                    headers={
-                        'Authorization': f'Bearer {self.token}',
-                        'Content-Type': 'application/json',
-                        'Accept': 'application/json'
-                    },
-                    data=json.dumps(cookie_ids)
-                )
-                response.raise_for_status()
-                result = response.json()
-            
+            result = await self._request(
+                'delete',
+                self._envs_url,
+                headers=self.JSON_HEADERS,
+                data=orjson.dumps(cookie_ids)
+            )
             if result.get('code') == 200:
-                return True, f"成功删除 {len(cookie_ids)} 个Cookie"
-            else:
-                return False, f"删除失败: {result.get('message', '未知错误')}"
+                return True, None
+            return False, result.get('message', '未知错误')
         except Exception as e:
             logger.error(f"❌ 删除Cookie失败 ({self.name}): {e}")
-            return False, f"删除出错: {str(e)}"
+            return False, str(e)
+    
+    async def delete_cookies(self, cookie_ids):
+        """删除指定ID的Cookies，按 DELETE_BATCH_SIZE 分批并发删除"""
+        if not cookie_ids:
+            return True, "没有需要删除的Cookie"
+        
+        self.invalidate_envs()
+        
+        # 分批后单个请求体较小，某一批失败重试时也只需重发该批
+        batches = [cookie_ids[i:i + DELETE_BATCH_SIZE] for i in range(0, len(cookie_ids), DELETE_BATCH_SIZE)]
+        try:
+            results = await asyncio.gather(*(self._delete_batch(batch) for batch in batches))
+        finally:
+            # 删除期间可能有其他调用重新缓存了删除前的数据，完成后再清除一次
+            self.invalidate_envs()
+        errors = [error for success, error in results if not success]
+        
+        if not errors:
+            return True, f"成功删除 {len(cookie_ids)} 个Cookie"
+        return False, f"删除失败: {'; '.join(errors)}"
     
     async def add_cookies(self, cookies_info):
         """添加Cookies到面板"""
@@ -360,7 +541,8 @@ class QingLongAPI:
                 })
                 
             # 发送请求
-            result = await self._request('post', '/open/envs', json=envs)
+            self.invalidate_envs()
+            result = await self._request('post', self._envs_url, json=envs)
             
             if result and result.get('code') == 200:
                 return True, f"成功添加 {len(envs)} 个Cookie"
@@ -369,19 +551,60 @@ class QingLongAPI:
         except Exception as e:
             logger.error(f"❌ 添加Cookie失败 ({self.name}): {e}")
             return False, f"添加出错: {str(e)}"
+        finally:
+            # 添加期间可能有其他调用重新缓存了添加前的数据，完成后再清除一次
+            self.invalidate_envs()
+
+# 已创建的青龙面板客户端，按 (url, client_id) 缓存以复用访问令牌
+QL_CLIENTS = {}
+
+def get_ql(url, client_id, client_secret, name="主面板"):
+    """获取青龙面板客户端，同一面板复用同一个实例"""
+    key = (url.rstrip('/'), client_id)
+    api = QL_CLIENTS.get(key)
+    if api is None:
+        api = QingLongAPI(url, client_id, client_secret, name=name)
+        QL_CLIENTS[key] = api
+    return api
+
+def write_cookies_file(path, cookies):
+    """将CK写入文件（同步实现，通过asyncio.to_thread调用）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write("\n".join(cookies))
+
+def count_ck_lines(path):
+    """统计CK文件中的非空行数（同步实现，通过asyncio.to_thread调用）
+    
+    一次读取整个文件再按行切分，避免逐行迭代文件对象。以文本模式读取时 \r\n 和 \r 均被转换为 \n，
+    空白判断使用str.strip()，结果与逐行遍历完全一致。
+    """
+    with open(path) as ck_file:
+        return sum(1 for line in ck_file.read().split('\n') if line.strip())
+
+def ck_file_status(path):
+    """获取CK文件的CK数量和最后修改时间（同步实现，通过asyncio.to_thread调用）
+    
+    Returns:
+        tuple: (CK数量, 最后更新时间字符串)，文件不存在时返回None
+    """
+    try:
+        st = os.stat(path)
+        ck_count = count_ck_lines(path)
+    except FileNotFoundError:
+        return None
+    return ck_count, datetime.fromtimestamp(st.st_mtime, LOCAL_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
 
 async def save_cookies_to_file(cookies):
     """保存 Cookies 到文件，根据配置筛选保存"""
     try:
         # 获取CK_FILE_PATH配置
-        ck_file_config = CONFIG['CK_FILE_PATH']
+        ck_file_config = CONFIG.CK_FILE_PATH
         
         # 检查配置格式
         if isinstance(ck_file_config, str):
             # 兼容旧格式
-            os.makedirs(os.path.dirname(ck_file_config), exist_ok=True)
-            async with aiofiles.open(ck_file_config, 'w') as f:
-                await f.write("\n".join(cookies))
+            await asyncio.to_thread(write_cookies_file, ck_file_config, cookies)
             logger.info(f"✅ 已保存 {len(cookies)} 条 CK 到 {ck_file_config}")
             return True
         elif isinstance(ck_file_config, dict):
@@ -400,7 +623,7 @@ async def save_cookies_to_file(cookies):
                     mode = config.get('mode', 'exclude')
                     
                     # 清理pins中的格式
-                    clean_pins = [pin.replace("pt_pin=", "").strip(';') for pin in pins]
+                    clean_pins = clean_pin_set(pins)
                     
                     # 根据规则筛选CK
                     filtered_cookies = []
@@ -417,9 +640,7 @@ async def save_cookies_to_file(cookies):
                 
                 # 保存筛选后的CK到文件
                 if file_path and filtered_cookies:
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    async with aiofiles.open(file_path, 'w') as f:
-                        await f.write("\n".join(filtered_cookies))
+                    await asyncio.to_thread(write_cookies_file, file_path, filtered_cookies)
                     logger.info(f"✅ 已保存 {len(filtered_cookies)} 条 CK 到 {file_path} ({config_name})")
                     saved_count += len(filtered_cookies)
             
@@ -438,11 +659,8 @@ async def save_cookies_to_file(cookies):
 
 def extract_pt_pin(cookie_str):
     """从cookie字符串中提取pt_pin值"""
-    parts = cookie_str.split(';')
-    for part in parts:
-        if "pt_pin=" in part:
-            return part.strip().replace("pt_pin=", "")
-    return None
+    match = PT_PIN_RE.search(cookie_str)
+    return match.group(1) if match else None
 
 def should_preserve_cookie(pt_pin, panel_name=None):
     """判断是否应该保留这个cookie（基于pt_pin和面板名称）
@@ -457,32 +675,16 @@ def should_preserve_cookie(pt_pin, panel_name=None):
     if not pt_pin:
         return False
     
-    # 获取PRESERVED_PT_PINS配置
-    preserved_config = CONFIG['PRESERVED_PT_PINS']
-    
-    # 确定使用哪个面板的配置
-    panel_config = None
-    if panel_name and panel_name in preserved_config:
-        panel_config = preserved_config[panel_name]
-    else:
-        panel_config = preserved_config.get('default', {'pins': [], 'mode': 'exclude'})
-    
-    # 获取配置中的pins列表和模式
-    pins = panel_config.get('pins', [])
-    mode = panel_config.get('mode', 'exclude')
-    
-    # 清理pins中的格式
-    clean_pins = [pin.replace("pt_pin=", "").strip(';') for pin in pins]
-    
-    # 根据模式判断是否保留
-    is_in_list = pt_pin in clean_pins
+    # 确定使用哪个面板的规则，未单独配置时使用默认规则
+    rules = CONFIG.PRESERVED_RULES
+    pins, mode = rules.get(panel_name) or rules['default']
     
     # include模式：只保留列表中的pin
     # exclude模式：不保留列表中的pin
     if mode == 'include':
-        return is_in_list
+        return pt_pin in pins
     else:  # exclude模式
-        return not is_in_list
+        return pt_pin not in pins
 
 # ================ IP 白名单操作 ================
 async def get_current_ip():
@@ -502,11 +704,11 @@ async def manage_whitelist(operation, ip=None):
         return False if operation != 'list' else []
     
     try:
-        params = {"authkey": CONFIG['PROXY_AUTH_KEY'], "service": service_map[operation], "format": "json"}
+        params = {"authkey": CONFIG.PROXY_AUTH_KEY, "service": service_map[operation], "format": "json"}
         if ip and operation in ('add', 'del'):
             params["white"] = ip
             
-        result = await safe_request('get', CONFIG['PROXY_API_URL'], params=params)
+        result = await safe_request('get', CONFIG.PROXY_API_URL, params=params)
         
         if result.get("ret") == 200:
             if operation == 'list':
@@ -533,13 +735,148 @@ async def manage_whitelist(operation, ip=None):
 #     """清理单个面板的非保留Cookies - 已被QingLongAPI类替代"""
 #     pass
 
+# 限制同时操作的面板数量，避免面板过多时瞬间发起大量请求
+PANEL_SEMAPHORE = asyncio.Semaphore(16)
+
+async def clean_panel(api):
+    """清理单个面板中的非保留Cookies（根据面板特定的配置）"""
+    async with PANEL_SEMAPHORE:
+        try:
+            # 获取所有CK
+            cookies_info = await api.get_all_cookies()
+            if not cookies_info:
+                return {
+                    'name': api.name,
+                    'success': True,
+                    'message': "未发现CK",
+                    'deleted_count': 0
+                }
+            
+            # 找出需要删除的CK（根据面板特定的配置）
+            to_delete_ids = [
+                cookie['id'] for cookie in cookies_info
+                if not should_preserve_cookie(extract_pt_pin(cookie['pt_pin']), api.name)
+            ]
+            
+            # 执行删除
+            if to_delete_ids:
+                success, message = await api.delete_cookies(to_delete_ids)
+                if success:
+                    return {
+                        'name': api.name,
+                        'success': True,
+                        'message': f"已删除 {len(to_delete_ids)} 个非保留CK",
+                        'deleted_count': len(to_delete_ids)
+                    }
+                else:
+                    return {
+                        'name': api.name,
+                        'success': False,
+                        'message': f"删除失败 - {message}",
+                        'deleted_count': 0
+                    }
+            else:
+                return {
+                    'name': api.name,
+                    'success': True,
+                    'message': "没有需要删除的CK",
+                    'deleted_count': 0
+                }
+        except Exception as e:
+            logger.error("❌ 清理面板 %s CK出错: %s", api.name, e)
+            return {
+                'name': api.name,
+                'success': False,
+                'message': f"清理出错: {str(e)}",
+                'deleted_count': 0
+            }
+
+def diff_panel_cookies(panel_cookies, main_cookies, panel_name):
+    """对比面板与主面板的CK，计算需要删除和添加的部分
+    
+    Args:
+        panel_cookies: 面板中的所有CK（get_all_cookies的结果）
+        main_cookies: 主面板中启用的CK及备注（get_enabled_cookies_with_remarks的结果）
+        panel_name: 面板名称，用于选择同步规则
+        
+    Returns:
+        tuple: (需要删除的CK ID列表, 需要添加的CK列表)
+    """
+    # 主面板中按规则应同步到该面板的CK
+    wanted = {}
+    for cookie_info in main_cookies:
+        pt_pin = extract_pt_pin(cookie_info['value'])
+        if should_preserve_cookie(pt_pin, panel_name):
+            wanted[pt_pin] = cookie_info
+    
+    to_delete_ids = []
+    up_to_date = set()
+    for cookie in panel_cookies:
+        pt_pin = extract_pt_pin(cookie['pt_pin'])
+        if not should_preserve_cookie(pt_pin, panel_name):
+            # 按规则不应出现在该面板的CK
+            to_delete_ids.append(cookie['id'])
+            continue
+        
+        target = wanted.get(pt_pin)
+        if target is None:
+            # 主面板中没有的保留CK，保持不变
+            continue
+        
+        # 重复、已禁用或pt_key已变化的CK删除后重新添加
+        current = f"{cookie['pt_key']};{cookie['pt_pin']};"
+        if pt_pin in up_to_date or cookie['status'] != 0 or current != target['value']:
+            to_delete_ids.append(cookie['id'])
+        else:
+            up_to_date.add(pt_pin)
+    
+    to_add = [cookie_info for pt_pin, cookie_info in wanted.items() if pt_pin not in up_to_date]
+    return to_delete_ids, to_add
+
+# ================ Redis 操作 ================
+def now_str():
+    """当前本地时间字符串"""
+    return datetime.now(LOCAL_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+
+def compute_ck_hash(cookies):
+    """计算CK集合的SHA-256指纹，与CK顺序无关"""
+    h = hashlib.sha256()
+    for cookie in sorted(cookies):
+        h.update(cookie.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+def sync_fingerprint(ck_hash):
+    """CK同步指纹：CK哈希值加上同步相关配置的哈希值，配置变更后也会重新同步"""
+    config_hash = hashlib.sha256(
+        orjson.dumps([CONFIG.QL_PANELS, CONFIG.PRESERVED_PT_PINS], option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
+    return f"{ck_hash}:{config_hash[:16]}"
+
+async def save_ck_hash(client, ck_hash):
+    """保存CK哈希值及更新时间，命令通过pipeline一次发送
+    
+    Returns:
+        str: 保存前的CK哈希值，不存在时为None
+    """
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.get(CONFIG.CURRENT_CK_HASH_KEY)
+        pipe.set(CONFIG.CURRENT_CK_HASH_KEY, ck_hash)
+        pipe.set(f"{CONFIG.CURRENT_CK_HASH_KEY}_time", now_str())
+        old_hash, _, _ = await pipe.execute()
+    return old_hash
+
 # ================ 定时任务 ================
 async def update_ck():
-    """更新 CK 任务"""
+    """更新 CK 任务
+    
+    Returns:
+        bool: CK是否发生了变化，未变化时返回False，供调度器延长执行间隔
+    """
     try:
         logger.info("🔄 开始执行 CK 更新")
         # 使用QingLongAPI类获取CK
-        ql_api = QingLongAPI(CONFIG['QL_URL'], CONFIG['CLIENT_ID'], CONFIG['CLIENT_SECRET'])
+        ql_api = get_ql(CONFIG.QL_URL, CONFIG.CLIENT_ID, CONFIG.CLIENT_SECRET)
         cookies = await ql_api.get_enabled_cookies()
         
         if not cookies:
@@ -547,147 +884,112 @@ async def update_ck():
             return
             
         if await save_cookies_to_file(cookies):
-            ck_hash = hashlib.sha256(json.dumps(cookies, sort_keys=True).encode('utf-8')).hexdigest()
-            await redis_client.set(CONFIG['CURRENT_CK_HASH_KEY'], ck_hash)
+            ck_hash = compute_ck_hash(cookies)
+            old_hash = await save_ck_hash(redis_client, ck_hash)
             logger.info(f"✅ 已更新 {len(cookies)} 条 CK")
+            return ck_hash != old_hash
     except Exception as e:
         logger.error(f"❌ CK 更新出错: {e}", exc_info=True)
 
-async def sync_ck_to_panels():
-    """同步主青龙面板CK到其他面板"""
+async def sync_ck_to_panels(force=False):
+    """同步主青龙面板CK到其他面板
+    
+    Args:
+        force: 是否强制同步。默认在CK和同步配置都未变化时跳过本次同步
+    """
     try:
         logger.info("🔄 开始执行 CK 同步到其他面板")
         
         # 步骤1: 获取主青龙面板的CK（带备注）
-        main_ql = QingLongAPI(CONFIG['QL_URL'], CONFIG['CLIENT_ID'], CONFIG['CLIENT_SECRET'])
+        main_ql = get_ql(CONFIG.QL_URL, CONFIG.CLIENT_ID, CONFIG.CLIENT_SECRET)
         main_cookies_with_remarks = await main_ql.get_enabled_cookies_with_remarks()
         
         if not main_cookies_with_remarks:
             logger.warning("⚠️ 主青龙面板未获取到有效 CK")
             return
         
+        # 根据本次获取的主面板CK计算指纹，不依赖update_ck的执行间隔；与上次同步成功时一致说明无需同步
+        fingerprint = sync_fingerprint(compute_ck_hash([cookie_info['value'] for cookie_info in main_cookies_with_remarks]))
+        if not force and fingerprint == await redis_client.get(CONFIG.LAST_SYNCED_CK_HASH_KEY):
+            logger.info("ℹ️ CK 未变动，跳过同步")
+            return
+        
         logger.info(f"✅ 从主青龙面板获取到 {len(main_cookies_with_remarks)} 条有效CK")
         
         # 步骤2: 初始化所有面板的API客户端
         panel_apis = []
-        for panel in CONFIG['QL_PANELS']:
-            panel_apis.append(QingLongAPI(
+        for panel in CONFIG.QL_PANELS:
+            panel_apis.append(get_ql(
                 panel['url'], 
                 panel['client_id'], 
                 panel['client_secret'],
                 name=panel['name']
             ))
         
-        # 步骤3: 并行清理所有面板中的非保留Cookies
-        async def clean_panel(api):
-            try:
-                # 获取所有CK
-                cookies_info = await api.get_all_cookies()
-                if not cookies_info:
-                    return {
-                        'name': api.name,
-                        'success': True,
-                        'message': "未发现CK",
-                        'deleted_count': 0
-                    }
-                
-                # 找出需要删除的CK（根据面板特定的配置）
-                to_delete_ids = []
-                preserved_pins = []
-                
-                for cookie in cookies_info:
-                    pt_pin = extract_pt_pin(cookie['pt_pin'])
-                    if should_preserve_cookie(pt_pin, api.name):
-                        preserved_pins.append(pt_pin)
-                    else:
-                        to_delete_ids.append(cookie['id'])
-                
-                # 执行删除
-                if to_delete_ids:
-                    success, message = await api.delete_cookies(to_delete_ids)
-                    if success:
+        # 步骤3: 并行对比各面板与主面板的CK，只删除和添加有差异的部分（保留原始备注）
+        async def sync_panel(api):
+            async with PANEL_SEMAPHORE:
+                try:
+                    # 获取失败时抛出异常，避免把获取失败当作空面板而重复添加全部CK
+                    panel_cookies = await api.get_all_cookies(raise_errors=True)
+                    to_delete_ids, to_add = diff_panel_cookies(panel_cookies, main_cookies_with_remarks, api.name)
+                    
+                    if not to_delete_ids and not to_add:
                         return {
                             'name': api.name,
                             'success': True,
-                            'message': f"已删除 {len(to_delete_ids)} 个非保留CK",
-                            'deleted_count': len(to_delete_ids)
-                        }
-                    else:
-                        return {
-                            'name': api.name,
-                            'success': False,
-                            'message': f"删除失败 - {message}",
-                            'deleted_count': 0
+                            'message': "CK无变化，无需同步",
+                            'deleted_count': 0,
+                            'added_count': 0
                         }
-                else:
+                    
+                    # 先删除过期和不应同步的CK，删除失败时不再添加，避免产生重复CK
+                    if to_delete_ids:
+                        success, message = await api.delete_cookies(to_delete_ids)
+                        if not success:
+                            return {
+                                'name': api.name,
+                                'success': False,
+                                'message': f"删除失败 - {message}",
+                                'deleted_count': 0,
+                                'added_count': 0
+                            }
+                    
+                    success, message = await api.add_cookies(to_add)
                     return {
                         'name': api.name,
-                        'success': True,
-                        'message': "没有需要删除的CK",
-                        'deleted_count': 0
+                        'success': success,
+                        'message': message,
+                        'deleted_count': len(to_delete_ids),
+                        'added_count': len(to_add) if success else 0
                     }
-            except Exception as e:
-                logger.error(f"❌ 清理面板 {api.name} CK出错: {e}")
-                return {
-                    'name': api.name,
-                    'success': False,
-                    'message': f"清理出错: {str(e)}",
-                    'deleted_count': 0
-                }
-        
-        # 并行执行清理
-        clean_results = await asyncio.gather(*[clean_panel(api) for api in panel_apis])
-        
-        # 统计清理结果
-        total_deleted = sum(result['deleted_count'] for result in clean_results if result['success'])
-        logger.info(f"✅ 已从其他面板清理 {total_deleted} 条非保留CK")
-        
-        # 步骤4: 根据面板配置将主面板的CK添加到其他面板（保留原始备注）
-        async def add_cookies_to_panel(api):
-            try:
-                # 根据面板配置筛选需要添加的CK
-                filtered_cookies = []
-                for cookie_info in main_cookies_with_remarks:
-                    pt_pin = extract_pt_pin(cookie_info['value'])
-                    # 如果should_preserve_cookie返回True，表示这个CK应该被保留（即应该被同步）
-                    if should_preserve_cookie(pt_pin, api.name):
-                        filtered_cookies.append(cookie_info)
-                
-                if not filtered_cookies:
+                except Exception as e:
+                    logger.error(f"❌ 同步CK到面板 {api.name} 出错: {e}")
                     return {
                         'name': api.name,
-                        'success': True,
-                        'message': "根据配置，没有需要添加的CK"
+                        'success': False,
+                        'message': f"同步出错: {str(e)}",
+                        'deleted_count': 0,
+                        'added_count': 0
                     }
-                
-                success, message = await api.add_cookies(filtered_cookies)
-                return {
-                    'name': api.name,
-                    'success': success,
-                    'message': message
-                }
-            except Exception as e:
-                logger.error(f"❌ 添加CK到面板 {api.name} 出错: {e}")
-                return {
-                    'name': api.name,
-                    'success': False,
-                    'message': f"添加出错: {str(e)}"
-                }
         
-        # 并行执行添加
-        add_results = await asyncio.gather(*[add_cookies_to_panel(api) for api in panel_apis])
+        sync_results = await asyncio.gather(*[sync_panel(api) for api in panel_apis])
+        
+        # 统计同步结果
+        success_count = sum(1 for result in sync_results if result['success'])
+        total_deleted = sum(result['deleted_count'] for result in sync_results)
+        total_added = sum(result['added_count'] for result in sync_results)
         
-        # 统计添加结果
-        success_count = sum(1 for result in add_results if result['success'])
+        for result in sync_results:
+            if not result['success']:
+                logger.warning(f"⚠️ {result['name']}: {result['message']}")
         
-        # 生成详细报告
-        report = []
-        for result in add_results:
-            status = "✅" if result['success'] else "❌"
-            report.append(f"{status} {result['name']}: {result['message']}")
+        # 全部面板同步成功后记录本次同步的指纹
+        if success_count == len(panel_apis):
+            await redis_client.set(CONFIG.LAST_SYNCED_CK_HASH_KEY, fingerprint)
         
         # 记录同步结果到日志，不发送通知
-        logger.info(f"✅ CK同步任务完成，成功同步到 {success_count}/{len(panel_apis)} 个面板，同步了 {len(main_cookies_with_remarks)} 条CK，清理了 {total_deleted} 条非保留CK")
+        logger.info(f"✅ CK同步任务完成，成功同步到 {success_count}/{len(panel_apis)} 个面板，新增/更新了 {total_added} 条CK，删除了 {total_deleted} 条CK")
     except Exception as e:
         logger.error(f"❌ CK同步任务出错: {e}", exc_info=True)
         await notify("CK同步失败", str(e))
@@ -701,7 +1003,7 @@ async def update_ip_whitelist():
             logger.warning("⚠️ 获取当前IP失败")
             return
         
-        old_ip = await redis_client.get(CONFIG['CURRENT_IP_KEY'])
+        old_ip = await redis_client.get(CONFIG.CURRENT_IP_KEY)
         if current_ip == old_ip:
             logger.info("ℹ️ IP 未变动")
             return
@@ -717,8 +1019,11 @@ async def update_ip_whitelist():
                 if not del_success:
                     logger.warning(f"⚠️ 旧IP {old_ip} 删除失败，但不影响使用")
             
-            # 更新Redis中的IP记录
-            await redis_client.set(CONFIG['CURRENT_IP_KEY'], current_ip)
+            # 更新Redis中的IP记录（与更新时间一起在一次往返中写入）
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(CONFIG.CURRENT_IP_KEY, current_ip)
+                pipe.set(f"{CONFIG.CURRENT_IP_KEY}_time", now_str())
+                await pipe.execute()
             
             # 发送通知
             await notify(
@@ -734,45 +1039,90 @@ async def update_ip_whitelist():
 async def cleanup_logs():
     """清理日志目录"""
     try:
-        if os.path.exists(CONFIG['LOG_DIR']):
+        if os.path.exists(CONFIG.LOG_DIR):
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, shutil.rmtree, CONFIG['LOG_DIR'])
-            os.makedirs(CONFIG['LOG_DIR'], exist_ok=True)
-            logger.info(f"✅ 已清理日志目录: {CONFIG['LOG_DIR']}")
-            await notify("日志清理完成", f"已清空目录: {CONFIG['LOG_DIR']}")
+            await loop.run_in_executor(None, shutil.rmtree, CONFIG.LOG_DIR)
+            os.makedirs(CONFIG.LOG_DIR, exist_ok=True)
+            logger.info(f"✅ 已清理日志目录: {CONFIG.LOG_DIR}")
+            await notify("日志清理完成", f"已清空目录: {CONFIG.LOG_DIR}")
         else:
-            logger.warning(f"⚠️ 日志目录不存在: {CONFIG['LOG_DIR']}")
+            logger.warning(f"⚠️ 日志目录不存在: {CONFIG.LOG_DIR}")
     except Exception as e:
         logger.error(f"❌ 清理日志失败: {e}")
         await notify("日志清理失败", str(e))
 
 # 任务调度器
 async def run_task(task_func, name):
-    """执行单个任务并处理异常"""
+    """执行单个任务并处理异常，返回任务的返回值"""
     try:
-        await task_func()
+        return await task_func()
     except Exception as e:
         logger.error(f"❌ {name}执行错误: {e}")
 
-async def periodic_task(task_func, interval_minutes, name, run_immediately=True):
-    """定期执行任务
+# 周期任务定义，interval_minutes 为执行间隔（分钟）
+# adaptive 为True时，任务返回False（无变化）则下次间隔乘以 ADAPTIVE_BACKOFF_FACTOR，
+# 最多延长到 ADAPTIVE_MAX_MULTIPLIER 倍；任务返回其他值时恢复原始间隔
+PeriodicJob = namedtuple('PeriodicJob', ['func', 'interval_minutes', 'name', 'run_immediately', 'adaptive'],
+                         defaults=[True, False])
+ADAPTIVE_BACKOFF_FACTOR = 1.5
+ADAPTIVE_MAX_MULTIPLIER = 6
+
+async def periodic_scheduler(jobs):
+    """统一调度所有周期任务
+    
+    用最小堆维护每个任务的下次执行时间，整个调度器只有一个计时器在等待。
+    下次执行时间按上次的计划时间累加间隔计算，不受任务耗时影响而产生漂移；
+    任务在上一次执行完成后才会重新入堆，同一任务不会重叠执行。
     
     Args:
-        task_func: 要执行的任务函数
-        interval_minutes: 执行间隔（分钟）
-        name: 任务名称
-        run_immediately: 是否在启动时立即执行，默认为True
+        jobs: PeriodicJob 列表
     """
-    interval = interval_minutes * 60
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    running = set()
+    heap = []
+    intervals = [job.interval_minutes * 60 for job in jobs]
     
-    if not run_immediately:
-        logger.info(f"⏱️ {name}将在 {interval_minutes} 分钟后首次执行")
-        await asyncio.sleep(interval)
+    now = loop.time()
+    for index, job in enumerate(jobs):
+        if job.run_immediately:
+            heap.append((now, index, job))
+        else:
+            logger.info(f"⏱️ {job.name}将在 {job.interval_minutes} 分钟后首次执行")
+            heap.append((now + job.interval_minutes * 60, index, job))
+    heapq.heapify(heap)
+    
+    async def run_job(deadline, index, job):
+        result = await run_task(job.func, job.name)
+        if job.adaptive:
+            base_interval = job.interval_minutes * 60
+            if result is False:
+                intervals[index] = min(intervals[index] * ADAPTIVE_BACKOFF_FACTOR, base_interval * ADAPTIVE_MAX_MULTIPLIER)
+            else:
+                intervals[index] = base_interval
+        logger.info(f"⏱️ {job.name}完成，{intervals[index] / 60:g}分钟后再次执行")
+        next_deadline = max(deadline + intervals[index], loop.time())
+        heapq.heappush(heap, (next_deadline, index, job))
+        wakeup.set()
     
     while True:
-        await run_task(task_func, name)
-        logger.info(f"⏱️ {name}完成，{interval_minutes}分钟后再次执行")
-        await asyncio.sleep(interval)
+        wakeup.clear()
+        timeout = None
+        if heap:
+            deadline, index, job = heap[0]
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                heapq.heappop(heap)
+                task = asyncio.create_task(run_job(deadline, index, job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                continue
+        
+        # 等待最近的任务到期，或有任务执行完毕重新入堆
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
 async def schedule_daily_task(hour, minute, task_func, name):
     """每日定时任务调度器"""
@@ -793,10 +1143,164 @@ async def schedule_daily_task(hour, minute, task_func, name):
             logger.error(f"❌ 定时任务调度出错: {e}")
             await asyncio.sleep(60)
 
+# ================ 系统状态 ================
+GIB = 1 << 30
+
+def format_gb(num_bytes):
+    """将字节数格式化为保留两位小数的GB字符串"""
+    return f"{num_bytes / GIB:.2f} GB"
+
+# 进程运行期间不会变化的系统信息，启动时采集一次
+STATIC_SYS = {
+    "系统": f"{platform.system()} {platform.version()}",
+    "架构": platform.machine(),
+    "主机名": platform.node(),
+    "Python版本": platform.python_version(),
+    "CPU核心数": psutil.cpu_count(logical=False),
+    "逻辑CPU数": psutil.cpu_count(logical=True),
+    "总内存": format_gb(psutil.virtual_memory().total),
+    "总交换": format_gb(psutil.swap_memory().total),
+    "总磁盘": format_gb(psutil.disk_usage('/').total),
+    "BOOT_TIME": datetime.fromtimestamp(psutil.boot_time()),
+}
+
+# /zt 消息模板，静态信息取自 STATIC_SYS，其余字段在每次调用时填入
+STATUS_TEMPLATE = (
+    "📊 **系统状态**\n\n"
+    "🖥️ **系统信息**\n"
+    "• 系统: `{系统}`\n"
+    "• 架构: `{架构}`\n"
+    "• 主机名: `{主机名}`\n"
+    "• Python版本: `{Python版本}`\n"
+    "• 运行时间: `{uptime}`\n\n"
+    "🔄 **CPU信息**\n"
+    "• CPU核心数: `{CPU核心数}`\n"
+    "• 逻辑CPU数: `{逻辑CPU数}`\n"
+    "• CPU使用率: `{cpu_usage}`\n"
+    "• CPU频率: `{cpu_freq}`\n\n"
+    "💾 **内存信息**\n"
+    "• 总内存: `{总内存}`\n"
+    "• 可用内存: `{mem_available}`\n"
+    "• 内存使用率: `{mem_percent}%`\n\n"
+    "🔄 **交换分区**\n"
+    "• 总交换空间: `{总交换}`\n"
+    "• 已用交换空间: `{swap_used}`\n"
+    "• 交换空间使用率: `{swap_percent}%`\n\n"
+    "💽 **磁盘信息**\n"
+    "• 总空间: `{总磁盘}`\n"
+    "• 可用空间: `{disk_free}`\n"
+    "• 磁盘使用率: `{disk_percent}%`\n\n"
+    "🌐 **网络信息**\n"
+    "• 已发送: `{net_sent}`\n"
+    "• 已接收: `{net_recv}`\n\n"
+    "🔌 **连接信息**\n"
+    "{tcp_info}\n\n"
+    "🟢 **Node.js进程**: `{node_count}个`\n"
+)
+
+def ttl_cache(seconds):
+    """TTL缓存装饰器：有效期内直接返回上次的结果，并发调用时只采集一次
+    
+    被装饰的函数不接受参数，装饰后变为协程函数，并在线程池中执行以免阻塞事件循环。
+    """
+    def decorator(func):
+        lock = asyncio.Lock()
+        cache = {}
+        
+        @functools.wraps(func)
+        async def wrapper():
+            async with lock:
+                now = time.monotonic()
+                if cache and now - cache['ts'] < seconds:
+                    return cache['value']
+                value = await asyncio.to_thread(func)
+                cache['value'], cache['ts'] = value, now
+                return value
+        return wrapper
+    return decorator
+
+@ttl_cache(30)
+def get_tcp_info():
+    """TCP连接统计"""
+    try:
+        # 只获取一次连接列表，一次遍历统计各状态数量
+        connections = psutil.net_connections(kind='tcp')
+        status_counts = Counter(c.status for c in connections)
+        return {
+            "TCP连接总数": len(connections),
+            "已建立连接": status_counts[psutil.CONN_ESTABLISHED],
+            "监听连接": status_counts[psutil.CONN_LISTEN]
+        }
+    except psutil.AccessDenied:
+        return {"TCP连接信息": "无法获取（权限不足）"}
+
+def read_proc_comm(pid_dir):
+    """读取 /proc/<pid>/comm 中的进程名，进程已退出或无权限时返回空字符串"""
+    try:
+        with open(os.path.join(pid_dir, 'comm')) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+# Node.js 进程名前缀（node、node.exe 等），前缀匹配可避免对每个进程名做小写转换
+NODE_NAMES = ('node', 'Node', 'NODE')
+
+@ttl_cache(30)
+def get_node_count():
+    """Node.js进程数量，Linux下直接读取 /proc 而不为每个进程创建psutil对象"""
+    if psutil.LINUX:
+        return sum(1 for entry in os.scandir('/proc')
+                   if entry.name.isdigit() and read_proc_comm(entry.path).startswith(NODE_NAMES))
+    return sum(1 for proc in psutil.process_iter(['name'])
+               if (name := proc.info['name']) and name.startswith(NODE_NAMES))
+
+@ttl_cache(5)
+def get_cpu_freq():
+    """CPU频率"""
+    return psutil.cpu_freq()
+
+@ttl_cache(15)
+def get_memory():
+    return psutil.virtual_memory()
+
+@ttl_cache(15)
+def get_swap():
+    return psutil.swap_memory()
+
+@ttl_cache(15)
+def get_disk():
+    return psutil.disk_usage('/')
+
+@ttl_cache(5)
+def get_net_io():
+    return psutil.net_io_counters()
+
+# 最近一次采样得到的CPU使用率，由cpu_sampler在后台定期刷新
+cpu_usage = None
+
+async def cpu_sampler(interval=5):
+    """后台定期采样CPU使用率，/zt 直接读取最近一次的结果而无需阻塞等待"""
+    global cpu_usage
+    # 初始化采样基准，之后 interval=None 返回距上次调用以来的使用率
+    psutil.cpu_percent(interval=None)
+    while True:
+        await asyncio.sleep(interval)
+        cpu_usage = psutil.cpu_percent(interval=None)
+
 # ================ 机器人命令处理 ================
 class CkWhitelistBot:
-    def __init__(self, redis_client):
+    def __init__(self, redis_client, bot_info=None):
         self.redis_client = redis_client
+        # 启动时 getMe 得到的机器人信息，进程运行期间不会变化，需要时直接读取而无需再次请求
+        self.bot_info = bot_info or {}
+        # 面板客户端在启动时创建一次，各命令复用同一实例及其访问令牌
+        self.main_ql = get_ql(CONFIG.QL_URL, CONFIG.CLIENT_ID, CONFIG.CLIENT_SECRET)
+        self.panel_apis = [get_ql(
+            panel['url'], 
+            panel['client_id'], 
+            panel['client_secret'],
+            name=panel['name']
+        ) for panel in CONFIG.QL_PANELS]
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理 /start 命令"""
@@ -816,19 +1320,14 @@ class CkWhitelistBot:
     async def ck_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理 /ckstatus 命令"""
         try:
-            ck_file_config = CONFIG['CK_FILE_PATH']
+            ck_file_config = CONFIG.CK_FILE_PATH
             status_text = "🍪 **CK 状态**\n\n"
             
             # 处理不同格式的CK_FILE_PATH配置
             if isinstance(ck_file_config, str):
                 # 旧格式，单一文件路径
-                ck_count, ck_last_update_time = 0, "未知"
-                
-                if os.path.exists(ck_file_config):
-                    with open(ck_file_config, "r") as ck_file:
-                        ck_count = sum(1 for line in ck_file if line.strip())
-                    ck_last_update = os.path.getmtime(ck_file_config)
-                    ck_last_update_time = datetime.fromtimestamp(ck_last_update, LOCAL_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+                file_status = await asyncio.to_thread(ck_file_status, ck_file_config)
+                ck_count, ck_last_update_time = file_status or (0, "未知")
                 
                 status_text += f"总数量: `{ck_count}`\n"
                 status_text += f"最后更新时间: `{ck_last_update_time}`\n"
@@ -839,14 +1338,16 @@ class CkWhitelistBot:
                 total_count = 0
                 status_text += "**文件列表:**\n"
                 
-                for config_name, config in ck_file_config.items():
-                    file_path = config if isinstance(config, str) else config.get('path')
-                    
-                    if file_path and os.path.exists(file_path):
-                        with open(file_path, "r") as ck_file:
-                            file_ck_count = sum(1 for line in ck_file if line.strip())
-                        ck_last_update = os.path.getmtime(file_path)
-                        ck_last_update_time = datetime.fromtimestamp(ck_last_update, LOCAL_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+                # 在线程中并行读取所有文件的状态，避免阻塞事件循环
+                file_paths = [config if isinstance(config, str) else config.get('path') for config in ck_file_config.values()]
+                file_statuses = await asyncio.gather(*(
+                    asyncio.to_thread(ck_file_status, file_path) if file_path else asyncio.sleep(0)
+                    for file_path in file_paths
+                ))
+                
+                for (config_name, config), file_path, file_status in zip(ck_file_config.items(), file_paths, file_statuses):
+                    if file_status:
+                        file_ck_count, ck_last_update_time = file_status
                         
                         status_text += f"\n📄 **{config_name}**\n"
                         status_text += f"  - 数量: `{file_ck_count}`\n"
@@ -875,17 +1376,15 @@ class CkWhitelistBot:
         """处理 /getck 命令"""
         msg = await update.message.reply_text("🔄 正在获取 CK...")
         try:
-            # 使用QingLongAPI类获取CK
-            ql_api = QingLongAPI(CONFIG['QL_URL'], CONFIG['CLIENT_ID'], CONFIG['CLIENT_SECRET'])
-            cookies = await ql_api.get_enabled_cookies()
+            cookies = await self.main_ql.get_enabled_cookies()
             
             if not cookies:
                 await msg.edit_text("⚠️ 未获取到有效的 CK")
                 return
                 
             if await save_cookies_to_file(cookies):
-                ck_hash = hashlib.sha256(json.dumps(cookies, sort_keys=True).encode('utf-8')).hexdigest()
-                await self.redis_client.set(CONFIG['CURRENT_CK_HASH_KEY'], ck_hash)
+                ck_hash = compute_ck_hash(cookies)
+                await save_ck_hash(self.redis_client, ck_hash)
                 await msg.edit_text(f"✅ 已成功获取并保存 {len(cookies)} 条 CK")
             else:
                 await msg.edit_text("❌ CK 保存失败")
@@ -952,96 +1451,33 @@ class CkWhitelistBot:
         msg = await update.message.reply_text("🔄 正在获取系统状态...")
         
         try:
-            # 系统信息
-            system_info = {
-                "系统": f"{platform.system()} {platform.version()}",
-                "架构": platform.machine(),
-                "主机名": platform.node(),
-                "Python版本": platform.python_version()
-            }
-            
-            # 获取系统启动时间
-            boot_time = datetime.fromtimestamp(psutil.boot_time())
-            uptime = datetime.now() - boot_time
+            # 运行时间
+            uptime = datetime.now() - STATIC_SYS["BOOT_TIME"]
             days, seconds = uptime.days, uptime.seconds
             hours = seconds // 3600
             minutes = (seconds % 3600) // 60
             
-            # CPU信息
-            cpu_info = {
-                "CPU核心数": psutil.cpu_count(logical=False),
-                "逻辑CPU数": psutil.cpu_count(logical=True),
-                "CPU使用率": f"{psutil.cpu_percent(interval=0.5)}%",
-                "CPU频率": f"{psutil.cpu_freq().current:.2f} MHz" if psutil.cpu_freq() else "未知"
-            }
-            
-            # 内存信息
-            memory = psutil.virtual_memory()
-            memory_info = {
-                "总内存": f"{memory.total / (1024 ** 3):.2f} GB",
-                "可用内存": f"{memory.available / (1024 ** 3):.2f} GB",
-                "内存使用率": f"{memory.percent}%"
-            }
-            
-            # 交换分区信息
-            swap = psutil.swap_memory()
-            swap_info = {
-                "总交换空间": f"{swap.total / (1024 ** 3):.2f} GB",
-                "已用交换空间": f"{swap.used / (1024 ** 3):.2f} GB",
-                "交换空间使用率": f"{swap.percent}%"
-            }
-            
-            # 磁盘信息
-            disk = psutil.disk_usage('/')
-            disk_info = {
-                "总空间": f"{disk.total / (1024 ** 3):.2f} GB",
-                "可用空间": f"{disk.free / (1024 ** 3):.2f} GB",
-                "磁盘使用率": f"{disk.percent}%"
-            }
-            
-            # 网络信息
-            net_io = psutil.net_io_counters()
-            net_info = {
-                "已发送": f"{net_io.bytes_sent / (1024 ** 3):.2f} GB",
-                "已接收": f"{net_io.bytes_recv / (1024 ** 3):.2f} GB"
-            }
-            
-            # 尝试获取TCP连接信息
-            try:
-                tcp_connections = len(psutil.net_connections(kind='tcp'))
-                tcp_established = len([c for c in psutil.net_connections(kind='tcp') if c.status == 'ESTABLISHED'])
-                tcp_listen = len([c for c in psutil.net_connections(kind='tcp') if c.status == 'LISTEN'])
-                tcp_info = {
-                    "TCP连接总数": tcp_connections,
-                    "已建立连接": tcp_established,
-                    "监听连接": tcp_listen
-                }
-            except psutil.AccessDenied:
-                tcp_info = {"TCP连接信息": "无法获取（权限不足）"}
-            
-            # Node.js进程数量
-            node_count = len([proc for proc in psutil.process_iter(['name']) 
-                             if 'node' in proc.info['name'].lower()])
+            # 各项指标互不依赖，并行采集
+            cpu_freq, memory, swap, disk, net_io, tcp_info, node_count = await asyncio.gather(
+                get_cpu_freq(), get_memory(), get_swap(), get_disk(), get_net_io(), get_tcp_info(), get_node_count()
+            )
             
-            # 格式化输出
-            status_text = (
-                "📊 **系统状态**\n\n"
-                "🖥️ **系统信息**\n" + 
-                "\n".join(f"• {k}: `{v}`" for k, v in system_info.items()) +
-                f"\n• 运行时间: `{days}天{hours}时{minutes}分`" +
-                "\n\n🔄 **CPU信息**\n" + 
-                "\n".join(f"• {k}: `{v}`" for k, v in cpu_info.items()) +
-                "\n\n💾 **内存信息**\n" + 
-                "\n".join(f"• {k}: `{v}`" for k, v in memory_info.items()) +
-                "\n\n🔄 **交换分区**\n" + 
-                "\n".join(f"• {k}: `{v}`" for k, v in swap_info.items()) +
-                "\n\n💽 **磁盘信息**\n" + 
-                "\n".join(f"• {k}: `{v}`" for k, v in disk_info.items()) +
-                "\n\n🌐 **网络信息**\n" + 
-                "\n".join(f"• {k}: `{v}`" for k, v in net_info.items()) +
-                "\n\n🔌 **连接信息**\n" + 
-                "\n".join(f"• {k}: `{v}`" for k, v in tcp_info.items()) +
-                f"\n\n🟢 **Node.js进程**: `{node_count}个`\n"
+            # 消息版式已预先写在模板中，这里只填入各项数值
+            status_text = STATUS_TEMPLATE.format(
+                **STATIC_SYS,
+                uptime=f"{days}天{hours}时{minutes}分",
+                cpu_usage=f"{cpu_usage}%" if cpu_usage is not None else "采样中",
+                cpu_freq=f"{cpu_freq.current:.2f} MHz" if cpu_freq else "未知",
+                mem_available=format_gb(memory.available),
+                mem_percent=memory.percent,
+                swap_used=format_gb(swap.used),
+                swap_percent=swap.percent,
+                disk_free=format_gb(disk.free),
+                disk_percent=disk.percent,
+                net_sent=format_gb(net_io.bytes_sent),
+                net_recv=format_gb(net_io.bytes_recv),
+                tcp_info="\n".join(f"• {k}: `{v}`" for k, v in tcp_info.items()),
+                node_count=node_count
             )
             
             await msg.edit_text(status_text, parse_mode="Markdown")
@@ -1064,17 +1500,11 @@ class CkWhitelistBot:
         
         try:
             # 确保只处理QL_PANELS中的面板，不处理主面板
-            if not CONFIG['QL_PANELS']:
+            if not CONFIG.QL_PANELS:
                 await msg.edit_text("⚠️ 未配置任何新增青龙面板，请先在CONFIG中添加QL_PANELS配置")
                 return
             
-            # 初始化所有面板的API客户端
-            panel_apis = [QingLongAPI(
-                panel['url'], 
-                panel['client_id'], 
-                panel['client_secret'],
-                name=panel['name']
-            ) for panel in CONFIG['QL_PANELS']]
+            panel_apis = self.panel_apis
         
             if cmd == "list":
                 # 并行获取所有面板数据
@@ -1087,7 +1517,7 @@ class CkWhitelistBot:
                             'cookies_info': cookies_info
                         }
                     except Exception as e:
-                        logger.error(f"❌ 获取面板{api.name}数据失败: {e}")
+                        logger.error("❌ 获取面板%s数据失败: %s", api.name, e)
                         return {
                             'name': api.name,
                             'success': False,
@@ -1114,102 +1544,44 @@ class CkWhitelistBot:
                         result_text += f"ℹ️ **{panel_data['name']}**: 未发现CK\n"
                         continue
                     
-                    # 统计信息
-                    enabled_count = sum(1 for c in cookies_info if c['status'] == 0)
-                    disabled_count = sum(1 for c in cookies_info if c['status'] == 1)
-                    preserved_count = sum(1 for c in cookies_info if should_preserve_cookie(extract_pt_pin(c['pt_pin'])))
+                    # 统计信息，一次遍历完成所有计数
+                    enabled_count = disabled_count = preserved_count = 0
+                    for c in cookies_info:
+                        status = c['status']
+                        enabled_count += status == 0
+                        disabled_count += status == 1
+                        preserved_count += should_preserve_cookie(extract_pt_pin(c['pt_pin']))
                     
                     result_text += f"🔹 **{panel_data['name']}**: "
                     result_text += f"总数{len(cookies_info)} 启用{enabled_count} 禁用{disabled_count} 保留{preserved_count}\n"
                 
-                # 显示保留的pt_pin配置
+                # 显示保留的pt_pin配置，直接使用加载配置时预处理好的规则
                 result_text += "\n⭐ **CK同步配置**:\n"
-                preserved_config = CONFIG['PRESERVED_PT_PINS']
+                preserved_rules = CONFIG.PRESERVED_RULES
                 
                 # 显示默认配置
-                default_config = preserved_config.get('default', {'pins': [], 'mode': 'exclude'})
-                default_mode = "仅同步" if default_config.get('mode') == 'include' else "不同步"
-                default_pins = default_config.get('pins', [])
-                clean_default_pins = [pin.replace("pt_pin=", "").strip(';') for pin in default_pins if pin]
+                default_pins, default_mode = preserved_rules['default']
+                default_mode = "仅同步" if default_mode == 'include' else "不同步"
                 
                 result_text += f"**默认配置**: {default_mode}列表中的CK\n"
-                result_text += ", ".join(f"`{pin}`" for pin in clean_default_pins) if clean_default_pins else "无特定账号"
+                result_text += ", ".join(f"`{pin}`" for pin in sorted(default_pins)) if default_pins else "无特定账号"
                 result_text += "\n\n"
                 
                 # 显示每个面板的特定配置
-                panel_configs = [name for name in preserved_config.keys() if name != 'default']
+                panel_configs = [name for name in preserved_rules if name != 'default']
                 if panel_configs:
                     result_text += "**面板特定配置**:\n"
                     for panel_name in panel_configs:
-                        panel_config = preserved_config[panel_name]
-                        panel_mode = "仅同步" if panel_config.get('mode') == 'include' else "不同步"
-                        panel_pins = panel_config.get('pins', [])
-                        clean_panel_pins = [pin.replace("pt_pin=", "").strip(';') for pin in panel_pins if pin]
+                        panel_pins, panel_mode = preserved_rules[panel_name]
+                        panel_mode = "仅同步" if panel_mode == 'include' else "不同步"
                         
                         result_text += f"- **{panel_name}**: {panel_mode}列表中的CK\n"
-                        result_text += ", ".join(f"`{pin}`" for pin in clean_panel_pins) if clean_panel_pins else "无特定账号"
+                        result_text += ", ".join(f"`{pin}`" for pin in sorted(panel_pins)) if panel_pins else "无特定账号"
                         result_text += "\n"
                 
                 await msg.edit_text(result_text, parse_mode="Markdown")
                 
             elif cmd == "clean":
-                # 使用sync_ck_to_panels中定义的clean_panel函数
-                async def clean_panel(api):
-                    try:
-                        # 获取所有CK
-                        cookies_info = await api.get_all_cookies()
-                        if not cookies_info:
-                            return {
-                                'name': api.name,
-                                'success': True,
-                                'message': "未发现CK",
-                                'deleted_count': 0
-                            }
-                        
-                        # 找出需要删除的CK（根据面板特定的配置）
-                        to_delete_ids = []
-                        preserved_pins = []
-                        
-                        for cookie in cookies_info:
-                            pt_pin = extract_pt_pin(cookie['pt_pin'])
-                            if should_preserve_cookie(pt_pin, api.name):
-                                preserved_pins.append(pt_pin)
-                            else:
-                                to_delete_ids.append(cookie['id'])
-                        
-                        # 执行删除
-                        if to_delete_ids:
-                            success, message = await api.delete_cookies(to_delete_ids)
-                            if success:
-                                return {
-                                    'name': api.name,
-                                    'success': True,
-                                    'message': f"已删除 {len(to_delete_ids)} 个非保留CK",
-                                    'deleted_count': len(to_delete_ids)
-                                }
-                            else:
-                                return {
-                                    'name': api.name,
-                                    'success': False,
-                                    'message': f"删除失败 - {message}",
-                                    'deleted_count': 0
-                                }
-                        else:
-                            return {
-                                'name': api.name,
-                                'success': True,
-                                'message': "没有需要删除的CK",
-                                'deleted_count': 0
-                            }
-                    except Exception as e:
-                        logger.error(f"❌ 清理面板 {api.name} CK出错: {e}")
-                        return {
-                            'name': api.name,
-                            'success': False,
-                            'message': f"清理出错: {str(e)}",
-                            'deleted_count': 0
-                        }
-                
                 # 并行执行清理
                 clean_results = await asyncio.gather(*[clean_panel(api) for api in panel_apis])
                 
@@ -1234,30 +1606,37 @@ class CkWhitelistBot:
                 await msg.edit_text(f"❌ 未知命令: {cmd}")
                 
         except Exception as e:
-            logger.error(f"❌ 管理青龙面板CK出错: {e}", exc_info=True)
+            logger.error("❌ 管理青龙面板CK出错: %s", e, exc_info=True)
             await msg.edit_text(f"❌ 操作失败: {str(e)}")
             
     async def sync_ck_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理 /syncck 命令，手动执行CK同步到其他面板"""
         msg = await update.message.reply_text("🔄 正在执行CK同步到其他面板...")
         try:
-            # 执行同步并捕获详细结果
-            await sync_ck_to_panels()
-            
-            # 获取最新的同步状态
-            main_ql = QingLongAPI(CONFIG['QL_URL'], CONFIG['CLIENT_ID'], CONFIG['CLIENT_SECRET'])
-            main_cookies = await main_ql.get_enabled_cookies()
+            # 手动同步时忽略指纹检查，强制执行；同步只修改其他面板，主面板CK数量可并发获取
+            _, main_cookies = await asyncio.gather(
+                sync_ck_to_panels(force=True),
+                self.main_ql.get_enabled_cookies()
+            )
             
             # 构建详细的状态报告
             status_text = f"✅ CK同步操作已完成\n\n主面板CK数量: {len(main_cookies)}个"
             
             await msg.edit_text(status_text)
         except Exception as e:
-            logger.error(f"❌ 手动同步CK出错: {e}", exc_info=True)
+            logger.error("❌ 手动同步CK出错: %s", e, exc_info=True)
             await msg.edit_text(f"❌ 同步失败: {str(e)}")
 
 # ================ 主程序 ================
 async def main():
+    # 初始化共享的HTTP会话，复用连接池避免每次请求重新握手；json= 请求体使用orjson序列化
+    global http_session
+    http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=128, limit_per_host=64, ttl_dns_cache=300, keepalive_timeout=60),
+        json_serialize=lambda obj: orjson.dumps(obj).decode(),
+        # 与原httpx客户端一致，使用环境变量中的 HTTP(S)_PROXY 等代理设置
+        trust_env=True
+    )
     try:
         # 设置日志
         await setup_logging()
@@ -1265,42 +1644,42 @@ async def main():
         # 初始化Redis客户端
         global redis_client
         redis_client = StrictRedis(
-            host=CONFIG['REDIS_HOST'], 
-            port=CONFIG['REDIS_PORT'], 
-            db=CONFIG['REDIS_DB'], 
-            password=CONFIG['REDIS_PASSWORD'], 
+            host=CONFIG.REDIS_HOST, 
+            port=CONFIG.REDIS_PORT, 
+            db=CONFIG.REDIS_DB, 
+            password=CONFIG.REDIS_PASSWORD, 
             decode_responses=True,
             socket_timeout=10, 
             socket_connect_timeout=10
         )
         
-        logger.info(f"✅ 已从配置文件加载配置")
+        logger.info("✅ 已从配置文件加载配置")
         
         # 初始化 bot
-        base_url = CONFIG['TELEGRAM_PROXY_API'].rstrip('/')
-        logger.info(f"🔌 连接到 API: {base_url}")
+        base_url = CONFIG.TELEGRAM_PROXY_API.rstrip('/')
+        logger.info("🔌 连接到 API: %s", base_url)
         
         # 测试连接
         try:
-            test_url = f"{base_url}/bot{CONFIG['TELEGRAM_TOKEN']}/getMe"
+            test_url = f"{base_url}/bot{CONFIG.TELEGRAM_TOKEN}/getMe"
             bot_info = await safe_request('get', test_url)
             
             if bot_info.get("ok"):
                 bot_username = bot_info.get('result', {}).get('username')
-                logger.info(f"✅ 连接成功: @{bot_username}")
+                logger.info("✅ 连接成功: @%s", bot_username)
             else:
-                logger.error(f"❌ API 错误: {bot_info}")
+                logger.error("❌ API 错误: %s", bot_info)
                 return
         except Exception as e:
-            logger.error(f"❌ 连接失败: {e}")
+            logger.error("❌ 连接失败: %s", e)
             return       
         
         # 创建bot应用
-        bot = CkWhitelistBot(redis_client)
+        bot = CkWhitelistBot(redis_client, bot_info.get('result', {}))
         application = (
             ApplicationBuilder()
             .base_url(f"{base_url}/bot")
-            .token(CONFIG['TELEGRAM_TOKEN'])
+            .token(CONFIG.TELEGRAM_TOKEN)
             .build()
         )
         
@@ -1314,16 +1693,22 @@ async def main():
         application.add_handler(CommandHandler("ql", bot.manage_ql_cookies))
         application.add_handler(CommandHandler("syncck", bot.sync_ck_command))
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, 
-                                             lambda u, c: logger.info(f"📨 收到消息: {u.message.text[:20]}...")))
+                                             lambda u, c: logger.info("📨 收到消息: %.20s...", u.message.text)))
         
         # 启动应用
         await application.initialize()
         await application.start()
-        await application.updater.start_polling(poll_interval=1.0, drop_pending_updates=True)
+        # 使用长轮询由服务端保持连接直到有新消息，且只拉取已处理的消息类更新
+        await application.updater.start_polling(
+            poll_interval=0.0,
+            timeout=30,
+            allowed_updates=[Update.MESSAGE],
+            drop_pending_updates=True
+        )
         logger.info("🚀 机器人已启动，可接收命令")
         
         # 向管理员发送通知
-        admin_id = CONFIG['TG_USER_IDS'][0] if CONFIG['TG_USER_IDS'] else None
+        admin_id = CONFIG.TG_USER_IDS[0] if CONFIG.TG_USER_IDS else None
         if admin_id:
             await application.bot.send_message(
                 chat_id=admin_id, 
@@ -1332,18 +1717,29 @@ async def main():
         
         # 启动定时任务，不在启动时立即执行CK同步，而是按照配置的时间间隔执行
         tasks = [
-            periodic_task(update_ck, CONFIG['CK_UPDATE_INTERVAL'], "CK 更新"),
-            periodic_task(update_ip_whitelist, CONFIG['IP_UPDATE_INTERVAL'], "IP 白名单更新"),
-            periodic_task(sync_ck_to_panels, CONFIG['CK_SYNC_INTERVAL'], "CK 同步到其他面板", run_immediately=False),
-            schedule_daily_task(23, 59, cleanup_logs, "日志清理")
+            periodic_scheduler([
+                PeriodicJob(update_ck, CONFIG.CK_UPDATE_INTERVAL, "CK 更新", adaptive=True),
+                PeriodicJob(update_ip_whitelist, CONFIG.IP_UPDATE_INTERVAL, "IP 白名单更新"),
+                PeriodicJob(sync_ck_to_panels, CONFIG.CK_SYNC_INTERVAL, "CK 同步到其他面板", run_immediately=False),
+            ]),
+            schedule_daily_task(23, 59, cleanup_logs, "日志清理"),
+            cpu_sampler()
         ]
-        await asyncio.gather(*[asyncio.create_task(task) for task in tasks])
+        await asyncio.gather(*tasks)
             
     except Exception as e:
-        logger.error(f"❌ 启动失败: {e}", exc_info=True)
+        logger.error("❌ 启动失败: %s", e, exc_info=True)
+    finally:
+        await http_session.close()
 
 if __name__ == "__main__":
     print("\033[1;36m===== 正在启动 CK 和白名单管理程序 =====\033[0m")
+    # 安装了uvloop时使用其替换默认事件循环（Windows等不支持的平台自动跳过）
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     try:
         asyncio.run(main())
     except KeyboardInterrupt: